@@ -1,16 +1,51 @@
+import boot_trace
 import hal_screen, hal_keypad
 from play32sys import app, path
-from ui.select import select_list
-from ui.dialog import dialog
-from ui.input_text import input_text
+from utime import time
 import game
+import saves
+import stats
+boot_trace.mark("import")
+
+# ui modules are only needed once the first menu opens
+def select_list(*args, **kws):
+    from ui.select import select_list
+    return select_list(*args, **kws)
+
+def dialog(*args, **kws):
+    from ui.dialog import dialog
+    return dialog(*args, **kws)
+
+def input_text(*args, **kws):
+    from ui.input_text import input_text
+    return input_text(*args, **kws)
+
+def game_record(won):
+    # stats record of the current game, None if it's logged already or no move was made
+    if game.recorded or (not won and game.fc.get_move_count() == 0 and game.undo_count == 0):
+        return None
+    return game.fc.seed, won, game.fc.get_move_count(), game.undo_count, time() - game.start_time
+
+def log_game(record):
+    if record == None:
+        return
+    game.recorded = True
+    try:
+        stats.record(*record)
+    except OSError:
+        pass
+
+def finish_game(won):
+    log_game(game_record(won))
 
 def main(app_name, *args, **kws):
     hal_screen.init()
     hal_keypad.init()
     app_path = path.get_app_path(app_name)
     game.init(app_path)
+    boot_trace.mark("tiles")
     game.new_game()
+    boot_trace.mark("deal")
     main_loop(app_name)
     # game.game_loop()
     # app.reset_and_run_app("")
@@ -19,55 +54,88 @@ def main_loop(app_name):
     data_path = path.get_data_path(app_name)
     if not path.exist(data_path):
         path.mkdirs(data_path)
+    saves.init(data_path)
+    stats.init(data_path)
+    check_stuck = False # the position changed outside game_loop
     while True:
-        win = game.game_loop()
-        if win:
+        result = game.game_loop(check_stuck)
+        check_stuck = False
+        if result == game.LOOP_WIN:
+            finish_game(True)
             dialog("Congratulation!", "You Win")
             sel = select_list("Menu", [
                 "New Game",
+                "Statistics",
                 "Quit",
             ])
             if sel == 0:
                 game.new_game()
                 continue
             elif sel == 1:
+                dialog(stats.get_summary_text(), "Statistics")
+                continue
+            elif sel == 2:
                 app.reset_and_run_app("")
+        elif result == game.LOOP_STUCK:
+            sel = select_list("No More Moves", [
+                "Undo",
+                "New Game",
+            ])
+            if sel == 0:
+                game.undo()
+                check_stuck = True
+            elif sel == 1:
+                finish_game(False)
+                game.new_game()
+            continue
         sel = select_list("Menu", [
             "Undo",
             "Save",
             "Load",
             "New Game",
             "Select Game",
+            "Statistics",
             "Quit",
         ])
         if sel == 0:
-            game.fc.undo()
+            game.undo()
+            check_stuck = True
         elif sel == 1:
-            slot = select_list("Save Slot", [ str(i + 1) for i in range (10) ])
+            slot = select_list("Save Slot", saves.get_slot_labels())
             if slot >= 0:
-                name = str(slot + 1) + ".sav"
                 try:
-                    with open(path.join(data_path, name), "wb") as f:
-                        game.fc.save(f)
+                    saves.save(slot, game.fc, time())
                 except:
                     dialog("Save Failed.", "Result")
         elif sel == 2:
-            slot = select_list("Load Slot", [ str(i + 1) for i in range (10) ])
+            slot = select_list("Load Slot", saves.get_slot_labels())
             if slot >= 0:
-                name = str(slot + 1) + ".sav"
+                # the record is taken before the load replaces the game
+                record = game_record(False)
                 try:
-                    with open(path.join(data_path, name), "rb") as f:
-                        game.fc.load(f)
+                    saves.load(slot, game.fc)
                 except:
                     dialog("Load Failed.", "Result")
+                else:
+                    log_game(record)
+                    game.reset_record()
+                    check_stuck = True
         elif sel == 3:
+            finish_game(False)
             game.new_game()
         elif sel == 4:
             seed = input_text("", "Seed")
             if seed:
                 try:
-                    game.new_game(int(seed))
+                    seed = int(seed)
+                    assert 0 <= seed and 0xFFFFFFFF >= seed
                 except:
                     dialog("Bad Seed.", "Result")
+                else:
+                    finish_game(False)
+                    game.new_game(seed)
         elif sel == 5:
+            dialog(stats.get_summary_text(), "Statistics")
+        elif sel == 6:
+            finish_game(False)
             app.reset_and_run_app("")
\ No newline at end of file
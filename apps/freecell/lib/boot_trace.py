@@ -0,0 +1,24 @@
+from utime import ticks_ms, ticks_diff
+
+_START = ticks_ms()
+_MARKS = [] # (name, ms since start)
+
+def mark(name):
+    # only the first mark of each phase is kept
+    for n, _t in _MARKS:
+        if n == name:
+            return
+    _MARKS.append((name, ticks_diff(ticks_ms(), _START)))
+
+def get_marks():
+    return _MARKS
+
+def dump(stream=None):
+    last = 0
+    for name, t in _MARKS:
+        line = "{}: {}ms (+{}ms)".format(name, t, t - last)
+        if stream == None:
+            print(line)
+        else:
+            stream.write(line + "\n")
+        last = t
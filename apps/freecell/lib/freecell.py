@@ -6,6 +6,11 @@ try:
     from uos import urandom
 except ImportError:
     from os import urandom
+try:
+    from ubinascii import crc32
+except ImportError:
+    from binascii import crc32
+from kernels import rotate, tail_run
 
 def make_card(typ, val):
     return ((val << 2) | (typ & 0b11)) & 0b11111111
@@ -24,13 +29,93 @@ def split_history(byts):
     to = byts[1] & 0b1111
     return frm, to, size
 
+def make_meta(seed, moves, collected, timestamp):
+    return int.to_bytes(seed, 4, "big") + int.to_bytes(moves, 2, "big") + bytes([collected]) + int.to_bytes(timestamp, 4, "big")
+
+def split_meta(byts):
+    seed = int.from_bytes(byts[0:4], "big")
+    moves = int.from_bytes(byts[4:6], "big")
+    collected = byts[6]
+    timestamp = int.from_bytes(byts[7:11], "big")
+    return seed, moves, collected, timestamp
+
 CARD_EMPTY = 0b11111111
+SAVE_MAGIC = b"FCS"
+SAVE_VERSION = 1
+META_SIZE = 11
 # CARD: 6bit val, 2bit type
 #     ->  typ: 0b00, 0b10 is the same color, 0b01, 0b11 is the same color
 # history 8bit from, 8bit to
 #     ->  address: 4bit size, 4bit col or cell
 #         -> 0~7: cols 8~11: free_cell 12-15: recv_cell
 
+# save v1: 3byte magic, 1byte version, meta, state, history, 4byte crc32
+#     ->  meta: 4byte seed, 2byte moves, 1byte collected cards, 4byte timestamp
+#     ->  state: 52byte table, 8byte col tails, 4byte free cells, 4byte recv cells
+#     ->  history: 2byte length, 2byte * length records
+# save v0 (legacy): 4byte seed, state, history
+
+def _check_state(table, col_tails, free_cells, recv_cells):
+    # every card must show up exactly once
+    seen = bytearray(52)
+    last = 0
+    for tail in col_tails:
+        if tail < last or tail > 52:
+            return False
+        last = tail
+    for i in range(52):
+        card = table[i]
+        if i >= last:
+            if card != CARD_EMPTY:
+                return False
+            continue
+        typ, val = split_card(card)
+        if val >= 13 or seen[typ * 13 + val]:
+            return False
+        seen[typ * 13 + val] = 1
+    for card in free_cells:
+        if card == CARD_EMPTY:
+            continue
+        typ, val = split_card(card)
+        if val >= 13 or seen[typ * 13 + val]:
+            return False
+        seen[typ * 13 + val] = 1
+    for card in recv_cells:
+        if card == CARD_EMPTY:
+            continue
+        typ, val = split_card(card)
+        if val >= 13:
+            return False
+        for v in range(val + 1):
+            if seen[typ * 13 + v]:
+                return False
+            seen[typ * 13 + v] = 1
+    return sum(seen) == 52
+
+def parse_save(data):
+    # return seed, 68byte state, history records. raise ValueError if broken
+    if data[0:3] == SAVE_MAGIC:
+        if len(data) < 4 + META_SIZE + 68 + 2 + 4 or data[3] != SAVE_VERSION:
+            raise ValueError("bad save")
+        if int.from_bytes(data[-4:], "big") != crc32(data[:-4]) & 0xFFFFFFFF:
+            raise ValueError("bad checksum")
+        seed = split_meta(data[4 : 4 + META_SIZE])[0]
+        data = data[4 + META_SIZE : -4]
+    else:
+        # legacy save
+        if len(data) < 4 + 68 + 2:
+            raise ValueError("save truncated")
+        seed = int.from_bytes(data[0:4], "big")
+        data = data[4:]
+    state = data[0:68]
+    lng = int.from_bytes(data[68:70], "big")
+    records = data[70:]
+    if len(records) != lng * 2:
+        raise ValueError("bad history")
+    if not _check_state(state[0:52], state[52:60], state[60:64], state[64:68]):
+        raise ValueError("bad state")
+    return seed, state, records
+
 def random_int(xn):
     # return [0, 2**31)
     return (1103515245 * xn + 12345) % 0x80000000
@@ -45,6 +130,8 @@ class FreeCell:
         self.__col_tails = bytearray(8) # tail position of every col
         self.__free_cells = bytearray(4)
         self.__recv_cells = bytearray(4)
+        self.__col_runs = bytearray(8) # length of the movable sequence at the tail of every col
+        self.__stuck = None # cached result of is_stuck, None if dirty
         self.__history = BytesIO(b"") # 前2bit记录history大小
     
     @property
@@ -70,6 +157,9 @@ class FreeCell:
             self.__table[i] = self.__table[rand_i]
             self.__table[rand_i] = curr
         self.__col_tails = bytearray([7, 14, 21, 28, 34, 40, 46, 52])
+        for col in range(8):
+            self._update_col_run(col)
+        self.__stuck = None
 
     def get_col_info(self, col):
         assert 0 <= col and 8 > col
@@ -83,6 +173,10 @@ class FreeCell:
         assert index < end
         return self.__table[index]
     
+    def get_col_cards(self, col):
+        start, end, size = self.get_col_info(col)
+        return memoryview(self.__table)[start : end]
+
     def get_free_cell_card(self, fcid):
         assert fcid < 4 and fcid >= 0
         return self.__free_cells[fcid]
@@ -95,9 +189,18 @@ class FreeCell:
         if to < 0:
             return 0
         elif to < 8:
-            free_cells = sum(( 1 if card == CARD_EMPTY else 0 for card in self.__free_cells ))
-            free_cols = sum(( 1 if (col != to) and (self.get_col_info(col)[2] == 0) else 0 for col in range(8) ))
-            return (free_cells + 1) * (2 ** free_cols)
+            free_cells = 0
+            for card in self.__free_cells:
+                if card == CARD_EMPTY:
+                    free_cells += 1
+            free_cols = 0
+            last = 0
+            for col in range(8):
+                tail = self.__col_tails[col]
+                if col != to and tail == last:
+                    free_cols += 1
+                last = tail
+            return (free_cells + 1) << free_cols
         elif to < 12:
             fcid = to - 8
             if self.__free_cells[fcid] == CARD_EMPTY:
@@ -109,26 +212,15 @@ class FreeCell:
         else:
             return 0
 
+    def _update_col_run(self, col):
+        start, end, size = self.get_col_info(col)
+        self.__col_runs[col] = tail_run(self.__table, start, end)
+
     def _max_card_can_move_from(self, frm):
         if frm < 0:
             return 0
         elif frm < 8:
-            start, end, size = self.get_col_info(frm)
-            last_card = CARD_EMPTY
-            i = end - 1
-            while i >= start:
-                card = self.__table[i]
-                if last_card == CARD_EMPTY:
-                    last_card = card
-                else:
-                    l_typ, l_val = split_card(last_card)
-                    typ, val = split_card(card)
-                    if ((typ ^ l_typ) & 0b1) == 0b1 and l_val == val - 1:
-                        last_card = card
-                    else:
-                        return end - i - 1
-                i -= 1
-            return size
+            return self.__col_runs[frm]
         elif frm < 12:
             fcid = frm - 8
             if self.__free_cells[fcid] == CARD_EMPTY:
@@ -141,6 +233,7 @@ class FreeCell:
             return 0
     
     def _do_move(self, frm, to, size):
+        self.__stuck = None
         if frm < 8 and to < 8:
             f_ed = self.get_col_info(frm)[1]
             t_ed = self.get_col_info(to)[1]
@@ -149,27 +242,15 @@ class FreeCell:
             #   ||---|---|---|---|
             #   |  s f       t
             if frm < to:
-                p0 = f_ed - size
-                p1 = t_ed - size
-                tmp = self.__table[p0 : f_ed]
-                for p in range(p0, p1):
-                    self.__table[p] = self.__table[p + size]
-                for i in range(size):
-                    self.__table[p1 + i] = tmp[i]
+                rotate(self.__table, f_ed - size, f_ed, t_ed)
                 for i in range(frm, to):
                     self.__col_tails[i] -= size
             else:
-                p0 = t_ed + size
-                p1 = f_ed
-                tmp = self.__table[f_ed - size : f_ed]
-                p = p1 - 1
-                while p >= p0:
-                    self.__table[p] = self.__table[p - size]
-                    p -= 1
-                for i in range(size):
-                    self.__table[t_ed + i] = tmp[i]
+                rotate(self.__table, t_ed, f_ed - size, f_ed)
                 for i in range(to, frm):
                     self.__col_tails[i] += size
+            self._update_col_run(frm)
+            self._update_col_run(to)
         elif frm < 8 and to >= 8:
             # table to cell
             f_ed = self.get_col_info(frm)[1]
@@ -180,11 +261,11 @@ class FreeCell:
                 offs = to - 12
                 self.__recv_cells[offs] = self.__table[f_ed - 1]
             ed = self.get_col_info(7)[1]
-            for i in range(f_ed - 1, ed - 1):
-                self.__table[i] = self.__table[i + 1]
+            rotate(self.__table, f_ed - 1, f_ed, ed)
             self.__table[ed - 1] = CARD_EMPTY
             for i in range(frm, 8):
                 self.__col_tails[i] -= 1
+            self._update_col_run(frm)
         elif frm >= 8 and to < 8:
             # cell to table
             if frm < 12:
@@ -201,13 +282,11 @@ class FreeCell:
                     self.__recv_cells[offs] = CARD_EMPTY
             t_ed = self.get_col_info(to)[1]
             ed = self.get_col_info(7)[1]
-            i = ed
-            while i >= t_ed + 1:
-                self.__table[i] = self.__table[i - 1]
-                i -= 1
+            rotate(self.__table, t_ed, ed, ed + 1)
             self.__table[t_ed] = f_card
             for i in range(to, 8):
                 self.__col_tails[i] += 1
+            self._update_col_run(to)
         else:
             # cell to cell
             if frm < 12:
@@ -250,29 +329,94 @@ class FreeCell:
         self.__history.seek(0)
         self.__history.write(int.to_bytes(lng - 1, 2, "big"))
 
-    def save(self, stream):
-        stream.write(int.to_bytes(self.__seed, 4, "big")) # 4
-        stream.write(self.__table) # 52
-        stream.write(self.__col_tails) # 8
-        stream.write(self.__free_cells) # 4
-        stream.write(self.__recv_cells) # 4
+    def get_move_count(self):
+        self.__history.seek(0)
+        return int.from_bytes(self.__history.read(2), "big")
+
+    def get_collected_count(self):
+        count = 0
+        for card in self.__recv_cells:
+            if card != CARD_EMPTY:
+                count += split_card(card)[1] + 1
+        return count
+
+    def get_meta(self, timestamp=0):
+        return make_meta(self.__seed, self.get_move_count(), self.get_collected_count(), timestamp)
+
+    def save(self, stream, timestamp=0):
+        header = SAVE_MAGIC + bytes([SAVE_VERSION]) + self.get_meta(timestamp)
+        stream.write(header) # 4 + 11
+        crc = crc32(header)
+        for buf in (self.__table, self.__col_tails, self.__free_cells, self.__recv_cells):
+            stream.write(buf) # 52 + 8 + 4 + 4
+            crc = crc32(buf, crc)
         self.__history.seek(0)
         lng_bytes = self.__history.read(2)
-        stream.write(lng_bytes) # 2
         lng = int.from_bytes(lng_bytes, "big")
-        stream.write(self.__history.read(lng * 2)) # lng * 2
-    
+        records = self.__history.read(lng * 2)
+        stream.write(lng_bytes) # 2
+        stream.write(records) # lng * 2
+        crc = crc32(records, crc32(lng_bytes, crc))
+        stream.write(int.to_bytes(crc & 0xFFFFFFFF, 4, "big")) # 4
+
+    @staticmethod
+    def read_meta(stream):
+        # (seed, moves, collected, timestamp), without loading the game
+        head = stream.read(4 + META_SIZE)
+        if len(head) == 4 + META_SIZE and head[0:3] == SAVE_MAGIC and head[3] == SAVE_VERSION:
+            return split_meta(head[4:])
+        # legacy save
+        data = head + stream.read(4 + 68 + 2 - len(head))
+        if len(data) < 4 + 68 + 2:
+            raise ValueError("save truncated")
+        collected = 0
+        for card in data[68 : 72]:
+            if card != CARD_EMPTY:
+                collected += split_card(card)[1] + 1
+        return int.from_bytes(data[0:4], "big"), int.from_bytes(data[72:74], "big"), collected, 0
+
+    def replay(self, seed, records):
+        # deal the seed again and play the records by the rules,
+        # return how many records are good before the first bad one
+        self.init(seed)
+        count = len(records) // 2
+        good = count
+        for i in range(count):
+            b0 = records[i * 2]
+            b1 = records[i * 2 + 1]
+            size = b0 >> 4
+            # the moved size is chosen by the rules, it must match the record
+            if size == 0 or size != b1 >> 4 or size != self._move_size(b0 & 0b1111, b1 & 0b1111):
+                good = i
+                break
+            self._do_move(b0 & 0b1111, b1 & 0b1111, size)
+        # keep the good part as history, written once
+        self.__history.seek(0)
+        self.__history.write(int.to_bytes(good, 2, "big"))
+        self.__history.write(memoryview(records)[0 : good * 2])
+        return good
+
+    def same_state(self, state):
+        return self.__table == state[0:52] and self.__col_tails == state[52:60] \
+            and self.__free_cells == state[60:64] and self.__recv_cells == state[64:68]
+
     def load(self, stream):
-        self.__seed = int.from_bytes(stream.read(4), "big")
-        self.__table = bytearray(stream.read(52))
-        self.__col_tails = bytearray(stream.read(8))
-        self.__free_cells = bytearray(stream.read(4))
-        self.__recv_cells = bytearray(stream.read(4))
-        lng_bytes = stream.read(2)
-        lng = int.from_bytes(lng_bytes, "big")
+        # check everything before touching the current game
+        seed, state, records = parse_save(stream.read())
+        checker = FreeCell()
+        if checker.replay(seed, records) != len(records) // 2 or not checker.same_state(state):
+            raise ValueError("bad history")
+        self.__seed = seed
+        self.__table = bytearray(state[0:52])
+        self.__col_tails = bytearray(state[52:60])
+        self.__free_cells = bytearray(state[60:64])
+        self.__recv_cells = bytearray(state[64:68])
         self.__history = BytesIO(b"")
-        self.__history.write(lng_bytes)
-        self.__history.write(stream.read(lng * 2))
+        self.__history.write(int.to_bytes(len(records) // 2, 2, "big"))
+        self.__history.write(records)
+        for col in range(8):
+            self._update_col_run(col)
+        self.__stuck = None
     
     def possible_move(self):
         top_cards = bytearray(12)
@@ -315,18 +459,83 @@ class FreeCell:
                             return i, to + 12
         return None
 
-    def move(self, frm, to):
+    def _has_productive_move(self):
+        # only moves that change the position for real are counted,
+        # moves that just swap a sequence between equal cards are cyclic.
+        free_cells = 0
+        for card in self.__free_cells:
+            if card == CARD_EMPTY:
+                free_cells += 1
+        free_cols = 0
+        for col in range(8):
+            if self.get_col_info(col)[2] == 0:
+                free_cols += 1
+        # any card can be collected
+        nxt = bytearray(4) # store [typ -> next val]
+        for card in self.__recv_cells:
+            if card != CARD_EMPTY:
+                typ, val = split_card(card)
+                nxt[typ] = val + 1
+        for card in self.__free_cells:
+            if card != CARD_EMPTY:
+                typ, val = split_card(card)
+                if val == nxt[typ]:
+                    return True
+        for col in range(8):
+            start, end, size = self.get_col_info(col)
+            if size > 0:
+                typ, val = split_card(self.__table[end - 1])
+                if val == nxt[typ]:
+                    return True
+        # a card in table can be moved to free cell
+        if free_cells > 0 and free_cols < 8:
+            return True
+        # a free cell card can be moved to empty col. free cells are all taken here,
+        # so this also covers parking part of a sequence there through the cells
+        if free_cols > 0 and free_cells < 4:
+            return True
+        # a sequence or free cell card can be moved onto another col
+        max_to_col = (free_cells + 1) * (2 ** free_cols)
+        for to in range(8):
+            t_start, t_end, t_size = self.get_col_info(to)
+            if t_size <= 0:
+                continue
+            l_typ, l_val = split_card(self.__table[t_end - 1])
+            for card in self.__free_cells:
+                if card != CARD_EMPTY:
+                    typ, val = split_card(card)
+                    if ((typ ^ l_typ) & 0b1) == 0b1 and l_val == val + 1:
+                        return True
+            for frm in range(8):
+                if frm == to:
+                    continue
+                run = self.__col_runs[frm]
+                if run <= 0 or run > max_to_col:
+                    continue
+                # only the head of sequence, otherwise it already lies on an equal card
+                typ, val = split_card(self.__table[self.get_col_info(frm)[1] - run])
+                if ((typ ^ l_typ) & 0b1) == 0b1 and l_val == val + 1:
+                    return True
+        return False
+
+    def is_stuck(self):
+        if self.__stuck == None:
+            self.__stuck = not self._has_productive_move()
+        return self.__stuck
+
+    def _move_size(self, frm, to):
+        # how many cards the rules move from frm to to, 0 if not allowed
         assert frm >= 0 and frm < 16
         assert to >= 0 and to < 16
         if frm == to:
-            return False
+            return 0
         if frm >= 12: # from recv_cells, not allowed
-            return False
+            return 0
         max_can_move_from = self._max_card_can_move_from(frm)
         max_can_move_to = self._max_cards_can_move_to(to)
         max_can_move = min(max_can_move_from, max_can_move_to)
         if max_can_move <= 0: # can't move
-            return False
+            return 0
         # get target card
         t_card = CARD_EMPTY
         if to < 8:
@@ -356,7 +565,7 @@ class FreeCell:
                 f_card = self.__free_cells[fcid]
             typ, val = split_card(f_card)
             if val != 0:
-                return False
+                return 0
             move_size = 1
         # target is not empty, target can't be free cell
         elif frm < 8:
@@ -387,11 +596,15 @@ class FreeCell:
             l_typ, l_val = split_card(t_card)
             if to < 8:
                 if ((typ ^ l_typ) & 0b1) != 0b1 or l_val != val + 1:
-                    return False
+                    return 0
             elif to < 16:
                 if typ != l_typ or l_val != val - 1:
-                    return False
+                    return 0
             move_size = 1
+        return move_size
+
+    def move(self, frm, to):
+        move_size = self._move_size(frm, to)
         if move_size <= 0:
             return False
         # do the move
@@ -1,15 +1,23 @@
 from freecell import random_seed, FreeCell, split_card, CARD_EMPTY
-from utime import sleep_ms
-from play32hw.cpu import cpu_speed_context, FAST, VERY_SLOW, sleep
+from utime import sleep_ms, time
+from play32hw.cpu import sleep
+from governor import Governor
 import hal_screen, hal_keypad
 import tiles
+import boot_trace
+from kernels import draw_col, next_diff
 
 TILES_BOTTOM = b"\x04\x05"
 TILES_CURSOR_TOP = b"\x14\x14"
 TILES_CURSOR_BOTTOM = b"\x15\x15"
 TILES_EMPTY_SPACE = b"\x13\x13"
 
+LOOP_BACK = 0
+LOOP_WIN = 1
+LOOP_STUCK = 2
+
 fc = FreeCell()
+governor = Governor()
 table_data = bytearray(800) # 16 * ? tile_id
 last_screen = bytearray() # last screen content, onle 16 * ? tile_id
 current_screen = bytearray()
@@ -18,6 +26,9 @@ scene_lines = 0
 view_offset = 0
 selected = -1
 cursor = 0
+undo_count = 0 # undos of the current game
+start_time = 0 # when the current game started, s
+recorded = False # the current game is in stats log already
 
 def init(app_path):
     global last_screen, current_screen, screen_lines
@@ -74,18 +85,11 @@ def update_table():
         table_data[off : off + 2] = TILES_CURSOR_BOTTOM
     # render table
     cols_size = [ fc.get_col_info(col)[2] for col in range(8) ]
-    for l in range(max(cols_size) + 1):
-        lines += 1
-        base_off = lines * 16
-        for col in range(8):
-            off = base_off + col * 2
-            if l < cols_size[col]:
-                card = fc.get_card_at(col, l)
-                table_data[off : off + 2] = get_card_tiles(card)
-            elif l == cols_size[col] and cols_size[col] > 0:
-                table_data[off : off + 2] = TILES_BOTTOM
-            else:
-                table_data[off : off + 2] = TILES_EMPTY_SPACE
+    col_lines = max(cols_size) + 1
+    base_off = (lines + 1) * 16
+    for col in range(8):
+        draw_col(table_data, base_off + col * 2, fc.get_col_cards(col), col_lines)
+    lines += col_lines
     # render bottom cursors
     lines += 1
     base_off = lines * 16
@@ -127,24 +131,38 @@ def render(force=False):
     base_x = (scr_w - (16 * 8)) // 2
     base_y = (scr_h % 8) // 2
     changed = False
-    for row in range(screen_lines):
-        for col in range(16):
-            offset = (row * 16) + col
-            old_tid = last_screen[offset]
-            tid = current_screen[offset]
-            if old_tid != tid or force:
-                t = tiles.get_tile(tid)
-                frame.blit(t, base_x + col * 8, base_y + row * 8)
-                changed = True
+    size = 16 * screen_lines
+    offset = 0 if force else next_diff(last_screen, current_screen, 0, size)
+    while offset < size:
+        row, col = divmod(offset, 16)
+        t = tiles.get_tile(current_screen[offset])
+        frame.blit(t, base_x + col * 8, base_y + row * 8)
+        changed = True
+        offset += 1
+        if not force:
+            offset = next_diff(last_screen, current_screen, offset, size)
     if changed:
         last_screen[:] = current_screen[:]
         hal_screen.refresh()
 
+def reset_record():
+    global undo_count, start_time, recorded
+    undo_count = 0
+    start_time = time()
+    recorded = False
+
+def undo():
+    global undo_count
+    if fc.get_move_count() > 0:
+        fc.undo()
+        undo_count += 1
+
 def new_game(seed=None):
     global view_offset, selected, cursor
     if seed == None:
         seed = random_seed()
     fc.init(seed)
+    reset_record()
     view_offset = 0
     selected = -1
     cursor = 0
@@ -158,16 +176,19 @@ def is_win():
         return True
     return False
 
-def game_loop():
+def game_loop(check_stuck=False):
     global cursor, selected, view_offset
     update_table()
     focus_on_cursor()
     update_screen()
     render(True)
-    with cpu_speed_context(VERY_SLOW):
+    boot_trace.mark("first_render")
+    if check_stuck and not is_win() and fc.is_stuck():
+        return LOOP_STUCK
+    with governor.idle_context():
         while True:
             if is_win():
-                return True
+                return LOOP_WIN
             need_update_table = False
             need_focus_cursor = False
             need_check_possible_move = False
@@ -180,7 +201,7 @@ def game_loop():
                             need_update_table = True
                             need_focus_cursor = True
                         else:
-                            return False # go back
+                            return LOOP_BACK # go back
                     elif key == hal_keypad.KEY_A:
                         if selected < 0:
                             # select another target
@@ -224,21 +245,35 @@ def game_loop():
                                     cursor -= 1
                                 else:
                                     cursor += 1
-                    with cpu_speed_context(FAST):
+                    with governor.context():
+                        governor.begin()
                         if need_update_table:
                             update_table()
                         if need_focus_cursor:
                             focus_on_cursor()
                         update_screen()
+                        governor.lap("table")
                         render()
+                        governor.lap("render")
+                        governor.display()
+                        stuck = False
                         if need_check_possible_move:
                             possible = fc.possible_move()
                             while possible:
+                                governor.lap("collect")
                                 sleep_ms(500)
+                                governor.pause()
                                 frm, to = possible
                                 fc.move(frm, to)
                                 update_table()
                                 update_screen()
                                 render()
+                                governor.display()
                                 possible = fc.possible_move()
+                            governor.lap("collect")
+                            stuck = not is_win() and fc.is_stuck()
+                            governor.lap("search")
+                        governor.end()
+                    if stuck:
+                        return LOOP_STUCK
             sleep(10)
@@ -0,0 +1,98 @@
+try:
+    from utime import ticks_ms, ticks_diff
+except ImportError:
+    from time import monotonic
+    def ticks_ms():
+        return int(monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+
+# candidate speeds from slow to fast, only those the cpu module has are used
+SPEED_NAMES = ("VERY_SLOW", "SLOW", "MIDDLE", "FAST", "VERY_FAST")
+DEFAULT_TARGET_MS = 80 # input to display
+SLOWDOWN = 2 # estimated cost factor of one speed step down
+HISTORY_SIZE = 16
+
+class Governor:
+    def __init__(self, target_ms=DEFAULT_TARGET_MS, cpu=None, ticks=None):
+        if cpu == None:
+            import play32hw.cpu as cpu
+        self.cpu = cpu
+        self.ticks = ticks if ticks != None else ticks_ms
+        self.target_ms = target_ms
+        self.speed_names = [ name for name in SPEED_NAMES if hasattr(cpu, name) ]
+        self.speeds = [ getattr(cpu, name) for name in self.speed_names ]
+        self.level = len(self.speeds) - 1 # start fast, step down once measured
+        self.ema = [ 0 for _ in self.speeds ] # smoothed worst latency of every level, 0 if unknown
+        self.stages = {} # stage name -> ms of the last event
+        self.history = [] # (level, worst latency ms) of the last events
+        self.__last = 0
+        self.__seg_start = 0
+        self.__worst = 0
+
+    def idle_context(self):
+        return self.cpu.cpu_speed_context(self.speeds[0])
+
+    def context(self):
+        return self.cpu.cpu_speed_context(self.speeds[self.level])
+
+    def begin(self):
+        # an input arrived
+        now = self.ticks()
+        self.__last = now
+        self.__seg_start = now
+        self.__worst = 0
+        self.stages = {}
+
+    def lap(self, name):
+        # the work since the last lap belongs to this stage
+        now = self.ticks()
+        self.stages[name] = self.stages.get(name, 0) + ticks_diff(now, self.__last)
+        self.__last = now
+
+    def display(self):
+        # the user sees something, close the waiting segment
+        now = self.ticks()
+        self.__worst = max(self.__worst, ticks_diff(now, self.__seg_start))
+        self.__seg_start = now
+
+    def pause(self):
+        # time spent waiting on purpose is not latency,
+        # the work before the wait must be given to a stage by lap first
+        now = self.ticks()
+        self.__last = now
+        self.__seg_start = now
+
+    def end(self):
+        self.display()
+        worst = self.__worst
+        level = self.level
+        if self.ema[level] == 0 or worst > self.target_ms:
+            # a missed target counts at once
+            self.ema[level] = worst
+        else:
+            self.ema[level] = (self.ema[level] * 3 + worst) // 4
+        if level > 0:
+            # guess what the slower level would cost now, a measured cost only drifts slowly towards the guess
+            est = worst * SLOWDOWN
+            if self.ema[level - 1] == 0:
+                self.ema[level - 1] = est
+            elif est < self.ema[level - 1]:
+                self.ema[level - 1] = (self.ema[level - 1] * 7 + est) // 8
+        if worst > self.target_ms and level < len(self.speeds) - 1:
+            self.level = level + 1
+        elif level > 0 and self.ema[level - 1] <= self.target_ms:
+            self.level = level - 1
+        self.history.append((level, worst))
+        if len(self.history) > HISTORY_SIZE:
+            self.history.pop(0)
+        return worst
+
+    def get_stats(self):
+        return {
+            "speed": self.speed_names[self.level],
+            "target_ms": self.target_ms,
+            "ema_ms": dict(zip(self.speed_names, self.ema)),
+            "stages_ms": self.stages,
+            "history": self.history,
+        }
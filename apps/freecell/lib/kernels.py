@@ -0,0 +1,138 @@
+# hot loops of the game. py_* always exist, viper_* only on micropython,
+# the names without prefix are the ones the game uses
+try:
+    import micropython
+except ImportError:
+    micropython = None
+
+def py_rotate(buf, start, mid, end):
+    # buf[start:end] = buf[mid:end] + buf[start:mid]
+    buf[start:end] = buf[mid:end] + buf[start:mid]
+
+def py_tail_run(buf, start, end):
+    # length of the movable sequence at the tail of buf[start:end]
+    if end <= start:
+        return 0
+    last = buf[end - 1]
+    i = end - 2
+    while i >= start:
+        card = buf[i]
+        if ((card ^ last) & 0b1) == 0b1 and (last >> 2) == (card >> 2) - 1:
+            last = card
+        else:
+            return end - i - 1
+        i -= 1
+    return end - start
+
+def py_draw_col(buf, off, cards, lines):
+    # draw one table col into tile buffer, each line is 16 tiles
+    size = len(cards)
+    for l in range(lines):
+        if l < size:
+            card = cards[l]
+            buf[off] = card & 0b11
+            buf[off + 1] = (card >> 2) + 6
+        elif l == size and size > 0:
+            buf[off] = 0x04
+            buf[off + 1] = 0x05
+        else:
+            buf[off] = 0x13
+            buf[off + 1] = 0x13
+        off += 16
+
+def py_next_diff(last, current, start, end):
+    # index of next different tile, end if none
+    i = start
+    while i < end:
+        if last[i] != current[i]:
+            return i
+        i += 1
+    return end
+
+if micropython:
+    @micropython.viper
+    def viper_rotate(buf, start: int, mid: int, end: int):
+        # three reversals, without allocation
+        p = ptr8(buf)
+        i = start
+        j = mid - 1
+        while i < j:
+            t = p[i]
+            p[i] = p[j]
+            p[j] = t
+            i += 1
+            j -= 1
+        i = mid
+        j = end - 1
+        while i < j:
+            t = p[i]
+            p[i] = p[j]
+            p[j] = t
+            i += 1
+            j -= 1
+        i = start
+        j = end - 1
+        while i < j:
+            t = p[i]
+            p[i] = p[j]
+            p[j] = t
+            i += 1
+            j -= 1
+
+    @micropython.viper
+    def viper_tail_run(buf, start: int, end: int) -> int:
+        if end <= start:
+            return 0
+        p = ptr8(buf)
+        i = end - 1
+        last = p[i]
+        i -= 1
+        while i >= start:
+            card = p[i]
+            if ((card ^ last) & 0b1) == 0b1 and (last >> 2) == (card >> 2) - 1:
+                last = card
+            else:
+                return end - i - 1
+            i -= 1
+        return end - start
+
+    @micropython.viper
+    def viper_draw_col(buf, off: int, cards, lines: int):
+        p = ptr8(buf)
+        c = ptr8(cards)
+        size = int(len(cards))
+        l = 0
+        while l < lines:
+            if l < size:
+                card = int(c[l])
+                p[off] = card & 0b11
+                p[off + 1] = (card >> 2) + 6
+            elif l == size and size > 0:
+                p[off] = 0x04
+                p[off + 1] = 0x05
+            else:
+                p[off] = 0x13
+                p[off + 1] = 0x13
+            off += 16
+            l += 1
+
+    @micropython.viper
+    def viper_next_diff(last, current, start: int, end: int) -> int:
+        a = ptr8(last)
+        b = ptr8(current)
+        i = start
+        while i < end:
+            if a[i] != b[i]:
+                return i
+            i += 1
+        return end
+
+    rotate = viper_rotate
+    tail_run = viper_tail_run
+    draw_col = viper_draw_col
+    next_diff = viper_next_diff
+else:
+    rotate = py_rotate
+    tail_run = py_tail_run
+    draw_col = py_draw_col
+    next_diff = py_next_diff
@@ -0,0 +1,105 @@
+try:
+    from play32sys import path
+except ImportError:
+    import os.path as path
+try:
+    import uos
+except ImportError:
+    import os as uos
+from freecell import FreeCell, META_SIZE, make_meta, split_meta
+
+SLOT_COUNT = 10
+INDEX_NAME = "index.dat"
+RECORD_SIZE = 1 + META_SIZE # 1byte used flag, meta
+
+_data_path = ""
+_index = bytearray(SLOT_COUNT * RECORD_SIZE)
+_index_loaded = False
+
+def _slot_file(slot):
+    return path.join(_data_path, str(slot + 1) + ".sav")
+
+def _replace(tmp_file, target):
+    # write to tmp then rename, the old file stays valid until the rename
+    try:
+        uos.rename(tmp_file, target)
+    except OSError:
+        uos.remove(target)
+        uos.rename(tmp_file, target)
+
+def init(data_path):
+    global _data_path, _index_loaded
+    _data_path = data_path
+    _index_loaded = False
+
+def _load_index():
+    global _index_loaded
+    if _index_loaded:
+        return
+    _index_loaded = True
+    index_file = path.join(_data_path, INDEX_NAME)
+    for name in (index_file, index_file + ".tmp"):
+        try:
+            with open(name, "rb") as f:
+                data = f.read()
+            if len(data) == len(_index):
+                _index[:] = data
+                return
+        except OSError:
+            pass
+    # no index yet, build it from the slot files once
+    for slot in range(SLOT_COUNT):
+        off = slot * RECORD_SIZE
+        _index[off] = 0
+        try:
+            with open(_slot_file(slot), "rb") as f:
+                meta = FreeCell.read_meta(f)
+            _index[off + 1 : off + RECORD_SIZE] = make_meta(*meta)
+            _index[off] = 1
+        except (OSError, ValueError):
+            pass
+    try:
+        _write_index()
+    except OSError:
+        pass
+
+def _write_index():
+    index_file = path.join(_data_path, INDEX_NAME)
+    with open(index_file + ".tmp", "wb") as f:
+        f.write(_index)
+    _replace(index_file + ".tmp", index_file)
+
+def get_meta(slot):
+    # (seed, moves, collected, timestamp) or None if slot is empty
+    _load_index()
+    off = slot * RECORD_SIZE
+    if not _index[off]:
+        return None
+    return split_meta(_index[off + 1 : off + RECORD_SIZE])
+
+def get_slot_labels():
+    labels = []
+    for slot in range(SLOT_COUNT):
+        meta = get_meta(slot)
+        if meta == None:
+            labels.append("{}. Empty".format(slot + 1))
+        else:
+            seed, moves, collected, _t = meta
+            labels.append("{}. {}/52 {}mv".format(slot + 1, collected, moves))
+    return labels
+
+def save(slot, fc, timestamp=0):
+    target = _slot_file(slot)
+    with open(target + ".tmp", "wb") as f:
+        fc.save(f, timestamp)
+    _replace(target + ".tmp", target)
+    _load_index()
+    off = slot * RECORD_SIZE
+    _index[off] = 1
+    _index[off + 1 : off + RECORD_SIZE] = fc.get_meta(timestamp)
+    _write_index()
+
+def load(slot, fc):
+    # raise if the save is missing or broken, the game is untouched then
+    with open(_slot_file(slot), "rb") as f:
+        fc.load(f)
@@ -0,0 +1,112 @@
+try:
+    from play32sys import path
+except ImportError:
+    import os.path as path
+
+LOG_NAME = "games.log"
+SUMMARY_NAME = "summary.dat"
+RECORD_SIZE = 13
+SUMMARY_SIZE = 18
+# record: 4byte seed, 1byte won, 2byte moves, 2byte undos, 4byte duration(s)
+# summary: 4byte played, 4byte won, 2byte streak, 2byte best streak,
+#          4byte best time(s), 2byte best moves. best is 0 before the first win
+
+def make_record(seed, won, moves, undos, duration):
+    return int.to_bytes(seed, 4, "big") + bytes([1 if won else 0]) \
+        + int.to_bytes(min(moves, 0xFFFF), 2, "big") + int.to_bytes(min(undos, 0xFFFF), 2, "big") \
+        + int.to_bytes(min(max(duration, 0), 0xFFFFFFFF), 4, "big")
+
+def split_record(byts):
+    seed = int.from_bytes(byts[0:4], "big")
+    won = byts[4] != 0
+    moves = int.from_bytes(byts[5:7], "big")
+    undos = int.from_bytes(byts[7:9], "big")
+    duration = int.from_bytes(byts[9:13], "big")
+    return seed, won, moves, undos, duration
+
+def make_summary(played, won, streak, best_streak, best_time, best_moves):
+    return int.to_bytes(played, 4, "big") + int.to_bytes(won, 4, "big") \
+        + int.to_bytes(streak, 2, "big") + int.to_bytes(best_streak, 2, "big") \
+        + int.to_bytes(best_time, 4, "big") + int.to_bytes(best_moves, 2, "big")
+
+def split_summary(byts):
+    played = int.from_bytes(byts[0:4], "big")
+    won = int.from_bytes(byts[4:8], "big")
+    streak = int.from_bytes(byts[8:10], "big")
+    best_streak = int.from_bytes(byts[10:12], "big")
+    best_time = int.from_bytes(byts[12:16], "big")
+    best_moves = int.from_bytes(byts[16:18], "big")
+    return [played, won, streak, best_streak, best_time, best_moves]
+
+_data_path = ""
+_summary = None
+
+def init(data_path):
+    global _data_path, _summary
+    _data_path = data_path
+    _summary = None
+
+def _add(summary, won, moves, duration):
+    summary[0] += 1
+    if won:
+        summary[1] += 1
+        summary[2] = min(summary[2] + 1, 0xFFFF)
+        summary[3] = max(summary[3], summary[2])
+        if summary[4] == 0 or duration < summary[4]:
+            summary[4] = duration
+        if summary[5] == 0 or moves < summary[5]:
+            summary[5] = moves
+    else:
+        summary[2] = 0
+
+def _load_summary():
+    global _summary
+    if _summary != None:
+        return
+    try:
+        with open(path.join(_data_path, SUMMARY_NAME), "rb") as f:
+            data = f.read()
+        if len(data) == SUMMARY_SIZE:
+            _summary = split_summary(data)
+            return
+    except OSError:
+        pass
+    # summary lost, rebuild it from the log once
+    _summary = [0, 0, 0, 0, 0, 0]
+    try:
+        with open(path.join(_data_path, LOG_NAME), "rb") as f:
+            while True:
+                data = f.read(RECORD_SIZE)
+                if len(data) < RECORD_SIZE:
+                    break
+                seed, won, moves, undos, duration = split_record(data)
+                _add(_summary, won, moves, duration)
+    except OSError:
+        pass
+
+def record(seed, won, moves, undos, duration):
+    _load_summary()
+    with open(path.join(_data_path, LOG_NAME), "ab") as f:
+        f.write(make_record(seed, won, moves, undos, duration))
+    _add(_summary, won, min(moves, 0xFFFF), min(max(duration, 0), 0xFFFFFFFF))
+    with open(path.join(_data_path, SUMMARY_NAME), "wb") as f:
+        f.write(make_summary(*_summary))
+
+def get_summary():
+    # (played, won, streak, best streak, best time, best moves)
+    _load_summary()
+    return tuple(_summary)
+
+def get_summary_text():
+    played, won, streak, best_streak, best_time, best_moves = get_summary()
+    rate = (won * 100 // played) if played > 0 else 0
+    lines = [
+        "Played: {}".format(played),
+        "Won: {} ({}%)".format(won, rate),
+        "Streak: {}/{}".format(streak, best_streak),
+    ]
+    if best_time > 0:
+        lines.append("Best: {}:{:02d}".format(best_time // 60, best_time % 60))
+    if best_moves > 0:
+        lines.append("Fewest: {}mv".format(best_moves))
+    return "\n".join(lines)
@@ -0,0 +1,92 @@
+import io, random
+from freecell import FreeCell, make_card, parse_save, crc32, CARD_EMPTY
+
+def set_position(fc, cols, free_cells, recv_cells=(CARD_EMPTY,) * 4):
+    table = bytearray(b"\xff" * 52)
+    col_tails = bytearray(8)
+    pos = 0
+    for col, cards in enumerate(cols):
+        for card in cards:
+            table[pos] = card
+            pos += 1
+        col_tails[col] = pos
+    fc.init(0)
+    fc._FreeCell__table = table
+    fc._FreeCell__col_tails = col_tails
+    fc._FreeCell__free_cells = bytearray(free_cells)
+    fc._FreeCell__recv_cells = bytearray(recv_cells)
+    for col in range(8):
+        fc._update_col_run(col)
+    fc._FreeCell__stuck = None
+
+# typ 0, 2 red, typ 1, 3 black, val 0 is ace
+FULL_CELLS = [make_card(1, 8), make_card(1, 12), make_card(3, 12), make_card(3, 8)]
+OTHER_COLS = [
+    [make_card(2, 1), make_card(0, 11), make_card(3, 10)],
+    [make_card(3, 1), make_card(2, 11), make_card(1, 10)],
+    [make_card(1, 1), make_card(3, 5), make_card(0, 4)],
+    [make_card(0, 9), make_card(1, 5), make_card(2, 4)],
+    [make_card(2, 9), make_card(0, 3), make_card(1, 2)],
+    [make_card(1, 9), make_card(2, 3), make_card(3, 2)],
+]
+
+def test_empty_col_with_full_free_cells_is_not_stuck():
+    fc = FreeCell()
+    set_position(fc, [[], [make_card(0, 1), make_card(0, 7), make_card(1, 6)]] + OTHER_COLS, FULL_CELLS)
+    assert not fc.is_stuck()
+    assert fc.move(8, 0)
+    assert fc.move(1, 0)
+    assert fc.get_col_info(1)[2] == 1
+
+def test_no_productive_move_is_stuck():
+    fc = FreeCell()
+    set_position(fc, [[make_card(0, 12)], [make_card(0, 1), make_card(0, 7), make_card(1, 6)]] + OTHER_COLS, FULL_CELLS)
+    assert fc.is_stuck()
+
+def play(seed, steps=80):
+    fc = FreeCell()
+    fc.init(seed)
+    rnd = random.Random(seed)
+    for _ in range(steps):
+        moves = [ (f, t) for f in range(16) for t in range(16) if fc.move(f, t) and (fc.undo() or True) ]
+        if not moves:
+            break
+        if fc.get_move_count() > 0 and rnd.random() < 0.2:
+            fc.undo()
+        else:
+            fc.move(*rnd.choice(moves))
+    stream = io.BytesIO()
+    fc.save(stream)
+    return fc, bytearray(stream.getvalue())
+
+def test_replay_checks_every_record():
+    for seed in range(20):
+        fc, data = play(seed)
+        seed, state, records = parse_save(bytes(data))
+        checker = FreeCell()
+        assert checker.replay(seed, records) == fc.get_move_count()
+        assert checker.same_state(state)
+        if len(records) == 0:
+            continue
+        # wrong size in the record
+        bad = bytearray(records)
+        bad[0] = (bad[0] + 0x10) & 0xFF
+        assert checker.replay(seed, bad) == 0
+        # zero size record
+        bad[0] &= 0x0F
+        bad[1] &= 0x0F
+        assert checker.replay(seed, bad) == 0
+
+def test_load_rejects_edited_history():
+    fc, data = play(5)
+    assert fc.get_move_count() > 0
+    data[15 + 70 + 1] ^= 0x01 # target of the first move
+    data[-4:] = int.to_bytes(crc32(bytes(data[:-4])) & 0xFFFFFFFF, 4, "big")
+    game = FreeCell()
+    game.init(9)
+    try:
+        game.load(io.BytesIO(bytes(data)))
+        assert False
+    except ValueError:
+        pass
+    assert game.seed == 9
@@ -0,0 +1,96 @@
+from governor import Governor
+
+class StubCpu:
+    VERY_SLOW = 0
+    SLOW = 1
+    FAST = 2
+    VERY_FAST = 3
+    MHZ = (20, 40, 80, 240)
+
+    def __init__(self):
+        self.contexts = []
+
+    def cpu_speed_context(self, speed):
+        self.contexts.append(speed)
+        return speed
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+def event(gov, cpu, clock, work):
+    # work is ms at the fastest speed, it scales with the frequency
+    gov.context()
+    speed = cpu.contexts[-1]
+    gov.begin()
+    clock.now += work * cpu.MHZ[-1] // cpu.MHZ[speed]
+    gov.lap("table")
+    clock.now += work * cpu.MHZ[-1] // cpu.MHZ[speed]
+    gov.lap("render")
+    gov.display()
+    gov.pause() # a sleep is not latency
+    clock.now += 500
+    gov.pause()
+    return gov.end()
+
+def test_settles_on_slowest_speed_meeting_target():
+    cpu, clock = StubCpu(), Clock()
+    gov = Governor(target_ms=80, cpu=cpu, ticks=clock)
+    assert gov.get_stats()["speed"] == "VERY_FAST"
+    for _ in range(12):
+        event(gov, cpu, clock, 5)
+    stats = gov.get_stats()
+    # 60ms at SLOW, 120ms at VERY_SLOW
+    assert stats["speed"] == "SLOW"
+    assert stats["ema_ms"]["SLOW"] == 60
+    assert stats["stages_ms"] == {"table": 30, "render": 30}
+    assert stats["history"][-1] == (1, 60)
+
+def test_steps_up_on_miss():
+    cpu, clock = StubCpu(), Clock()
+    gov = Governor(target_ms=80, cpu=cpu, ticks=clock)
+    for _ in range(12):
+        event(gov, cpu, clock, 5)
+    assert gov.level == 1
+    worst = event(gov, cpu, clock, 15) # 180ms at SLOW
+    assert worst == 180
+    assert gov.level == 2
+    assert gov.get_stats()["ema_ms"]["SLOW"] == 180
+
+def test_skips_missing_speeds():
+    class TwoSpeedCpu:
+        VERY_SLOW = 0
+        FAST = 2
+        def cpu_speed_context(self, speed):
+            return speed
+    gov = Governor(cpu=TwoSpeedCpu(), ticks=Clock())
+    assert gov.speed_names == ["VERY_SLOW", "FAST"]
+    assert gov.idle_context() == 0
+    assert gov.context() == 2
+
+def test_collect_cascade_counts_every_step():
+    cpu, clock = StubCpu(), Clock()
+    gov = Governor(target_ms=80, cpu=cpu, ticks=clock)
+    gov.begin()
+    clock.now += 10
+    gov.lap("table")
+    clock.now += 10
+    gov.lap("render")
+    gov.display()
+    clock.now += 7 # first possible_move
+    for _ in range(3):
+        gov.lap("collect")
+        clock.now += 500 # sleep_ms
+        gov.pause()
+        clock.now += 10 # move, update_table, render
+        gov.display()
+        clock.now += 7 # possible_move
+    gov.lap("collect")
+    gov.lap("search")
+    assert gov.end() == 20
+    stages = gov.get_stats()["stages_ms"]
+    assert stages["collect"] == 7 + 3 * (10 + 7)
+    assert stages["table"] == 10 and stages["render"] == 10
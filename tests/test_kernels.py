@@ -0,0 +1,188 @@
+import random
+import kernels
+from freecell import FreeCell, split_card, split_history, CARD_EMPTY
+
+# the implementations before the kernels, kept as reference
+
+def ref_col_info(col_tails, col):
+    start = col_tails[col - 1] if col > 0 else 0
+    end = col_tails[col]
+    return start, end, end - start
+
+def ref_do_move(table, col_tails, free_cells, recv_cells, frm, to, size):
+    if frm < 8 and to < 8:
+        f_ed = ref_col_info(col_tails, frm)[1]
+        t_ed = ref_col_info(col_tails, to)[1]
+        if frm < to:
+            p0 = f_ed - size
+            p1 = t_ed - size
+            tmp = table[p0 : f_ed]
+            for p in range(p0, p1):
+                table[p] = table[p + size]
+            for i in range(size):
+                table[p1 + i] = tmp[i]
+            for i in range(frm, to):
+                col_tails[i] -= size
+        else:
+            p0 = t_ed + size
+            p1 = f_ed
+            tmp = table[f_ed - size : f_ed]
+            p = p1 - 1
+            while p >= p0:
+                table[p] = table[p - size]
+                p -= 1
+            for i in range(size):
+                table[t_ed + i] = tmp[i]
+            for i in range(to, frm):
+                col_tails[i] += size
+    elif frm < 8 and to >= 8:
+        f_ed = ref_col_info(col_tails, frm)[1]
+        if to < 12:
+            free_cells[to - 8] = table[f_ed - 1]
+        else:
+            recv_cells[to - 12] = table[f_ed - 1]
+        ed = ref_col_info(col_tails, 7)[1]
+        for i in range(f_ed - 1, ed - 1):
+            table[i] = table[i + 1]
+        table[ed - 1] = CARD_EMPTY
+        for i in range(frm, 8):
+            col_tails[i] -= 1
+    elif frm >= 8 and to < 8:
+        if frm < 12:
+            f_card = free_cells[frm - 8]
+            free_cells[frm - 8] = CARD_EMPTY
+        else:
+            f_card = recv_cells[frm - 12]
+            typ, val = split_card(f_card)
+            recv_cells[frm - 12] = ((val - 1) << 2 | typ) if val > 0 else CARD_EMPTY
+        t_ed = ref_col_info(col_tails, to)[1]
+        ed = ref_col_info(col_tails, 7)[1]
+        i = ed
+        while i >= t_ed + 1:
+            table[i] = table[i - 1]
+            i -= 1
+        table[t_ed] = f_card
+        for i in range(to, 8):
+            col_tails[i] += 1
+    else:
+        if frm < 12:
+            f_card = free_cells[frm - 8]
+            free_cells[frm - 8] = CARD_EMPTY
+        else:
+            f_card = recv_cells[frm - 12]
+            typ, val = split_card(f_card)
+            recv_cells[frm - 12] = ((val - 1) << 2 | typ) if val > 0 else CARD_EMPTY
+        if to < 12:
+            free_cells[to - 8] = f_card
+        else:
+            recv_cells[to - 12] = f_card
+
+def ref_max_card_can_move_from(table, col_tails, col):
+    start, end, size = ref_col_info(col_tails, col)
+    last_card = CARD_EMPTY
+    i = end - 1
+    while i >= start:
+        card = table[i]
+        if last_card == CARD_EMPTY:
+            last_card = card
+        else:
+            l_typ, l_val = split_card(last_card)
+            typ, val = split_card(card)
+            if ((typ ^ l_typ) & 0b1) == 0b1 and l_val == val - 1:
+                last_card = card
+            else:
+                return end - i - 1
+        i -= 1
+    return size
+
+def ref_table_cols(buf, lines, fc):
+    # the col part of update_table
+    cols_size = [ fc.get_col_info(col)[2] for col in range(8) ]
+    for l in range(max(cols_size) + 1):
+        lines += 1
+        base_off = lines * 16
+        for col in range(8):
+            off = base_off + col * 2
+            if l < cols_size[col]:
+                typ, val = split_card(fc.get_card_at(col, l))
+                buf[off : off + 2] = bytes([typ, val + 6])
+            elif l == cols_size[col] and cols_size[col] > 0:
+                buf[off : off + 2] = b"\x04\x05"
+            else:
+                buf[off : off + 2] = b"\x13\x13"
+    return lines
+
+def ref_render_diff(last, current, size):
+    return [ offset for offset in range(size) if last[offset] != current[offset] ]
+
+def state(fc):
+    return (bytearray(fc._FreeCell__table), bytearray(fc._FreeCell__col_tails),
+        bytearray(fc._FreeCell__free_cells), bytearray(fc._FreeCell__recv_cells))
+
+def last_record(fc):
+    lng = fc.get_move_count()
+    return split_history(fc._FreeCell__history.getvalue()[lng * 2 : lng * 2 + 2])
+
+def test_cpython_uses_fallback():
+    assert kernels.rotate is kernels.py_rotate
+    assert kernels.tail_run is kernels.py_tail_run
+    assert kernels.draw_col is kernels.py_draw_col
+    assert kernels.next_diff is kernels.py_next_diff
+
+def test_game_matches_previous_implementation():
+    rnd = random.Random(32)
+    for game in range(40):
+        fc = FreeCell()
+        fc.init(rnd.randrange(0x100000000))
+        for step in range(120):
+            before = state(fc)
+            if fc.get_move_count() > 0 and rnd.random() < 0.2:
+                frm, to, size = last_record(fc)
+                fc.undo()
+                ref_do_move(*before, to, frm, size)
+            else:
+                moves = [ (f, t) for f in range(16) for t in range(16) if fc.move(f, t) and (fc.undo() or True) ]
+                if not moves:
+                    break
+                frm, to = rnd.choice(moves)
+                assert fc.move(frm, to)
+                ref_do_move(*before, frm, to, last_record(fc)[2])
+            assert state(fc) == before
+            table, col_tails = before[0], before[1]
+            for col in range(8):
+                assert fc._max_card_can_move_from(col) == ref_max_card_can_move_from(table, col_tails, col)
+            # update_table cols
+            expect = bytearray(800)
+            got = bytearray(800)
+            ref_lines = ref_table_cols(expect, 3, fc)
+            col_lines = max([ fc.get_col_info(col)[2] for col in range(8) ]) + 1
+            for col in range(8):
+                kernels.draw_col(got, 4 * 16 + col * 2, fc.get_col_cards(col), col_lines)
+            assert 3 + col_lines == ref_lines
+            assert got == expect
+
+def test_next_diff_matches_render():
+    rnd = random.Random(27)
+    for _ in range(200):
+        size = 16 * rnd.randrange(1, 16)
+        last = bytearray([ rnd.randrange(24) for _ in range(size) ])
+        current = bytearray(last)
+        for i in rnd.sample(range(size), rnd.randrange(0, 20)):
+            current[i] = rnd.randrange(24)
+        got = []
+        offset = kernels.next_diff(last, current, 0, size)
+        while offset < size:
+            got.append(offset)
+            offset = kernels.next_diff(last, current, offset + 1, size)
+        assert got == ref_render_diff(last, current, size)
+
+def test_rotate():
+    rnd = random.Random(3)
+    for _ in range(200):
+        buf = bytearray(rnd.randbytes(52))
+        start = rnd.randrange(52)
+        end = rnd.randrange(start, 53)
+        mid = rnd.randrange(start, end + 1)
+        expect = buf[:start] + buf[mid:end] + buf[start:mid] + buf[end:]
+        kernels.rotate(buf, start, mid, end)
+        assert buf == expect
@@ -0,0 +1,93 @@
+import os
+import saves
+from freecell import FreeCell
+
+def saved_game(seed):
+    fc = FreeCell()
+    fc.init(seed)
+    return fc
+
+def write_slot(data_path, slot, fc):
+    with open(os.path.join(data_path, str(slot + 1) + ".sav"), "wb") as f:
+        fc.save(f)
+
+def test_index_is_rebuilt_when_missing(tmp_path):
+    data_path = str(tmp_path)
+    fc = saved_game(11)
+    fc.move(0, 8)
+    write_slot(data_path, 2, fc)
+    saves.init(data_path)
+    labels = saves.get_slot_labels()
+    assert len(labels) == saves.SLOT_COUNT
+    assert labels[0] == "1. Empty"
+    assert labels[2] == "3. 0/52 1mv"
+    assert saves.get_meta(2)[0:2] == (11, 1)
+    assert os.path.getsize(os.path.join(data_path, saves.INDEX_NAME)) == saves.SLOT_COUNT * saves.RECORD_SIZE
+
+def test_index_tmp_is_used_when_index_is_missing(tmp_path):
+    data_path = str(tmp_path)
+    saves.init(data_path)
+    saves.save(4, saved_game(7), 100)
+    index_file = os.path.join(data_path, saves.INDEX_NAME)
+    os.rename(index_file, index_file + ".tmp")
+    os.remove(os.path.join(data_path, "5.sav")) # a rebuild would lose slot 5
+    saves.init(data_path)
+    assert saves.get_meta(4) == (7, 0, 0, 100)
+
+def test_save_updates_index_and_labels(tmp_path):
+    data_path = str(tmp_path)
+    saves.init(data_path)
+    fc = saved_game(3)
+    fc.move(0, 8)
+    fc.move(1, 9)
+    saves.save(0, fc, 42)
+    assert saves.get_slot_labels()[0] == "1. 0/52 2mv"
+    saves.init(data_path) # read back from index.dat
+    assert saves.get_meta(0) == (3, 2, 0, 42)
+    assert not os.path.exists(os.path.join(data_path, "1.sav.tmp"))
+    loaded = FreeCell()
+    saves.load(0, loaded)
+    assert loaded.seed == 3 and loaded.get_move_count() == 2
+
+def test_replace_overwrites_target(tmp_path, monkeypatch):
+    target = str(tmp_path / "a.dat")
+    for data in (b"old", b"new"):
+        with open(target + ".tmp", "wb") as f:
+            f.write(data)
+        saves._replace(target + ".tmp", target)
+    with open(target, "rb") as f:
+        assert f.read() == b"new"
+    # a filesystem that refuses to rename over an existing file
+    rename = os.rename
+    def strict_rename(src, dst):
+        if os.path.exists(dst):
+            raise OSError("exists")
+        rename(src, dst)
+    monkeypatch.setattr(saves.uos, "rename", strict_rename)
+    with open(target + ".tmp", "wb") as f:
+        f.write(b"newer")
+    saves._replace(target + ".tmp", target)
+    with open(target, "rb") as f:
+        assert f.read() == b"newer"
+    assert not os.path.exists(target + ".tmp")
+
+def test_corrupt_slot_leaves_game_untouched(tmp_path):
+    data_path = str(tmp_path)
+    saves.init(data_path)
+    saves.save(0, saved_game(5), 0)
+    slot_file = os.path.join(data_path, "1.sav")
+    with open(slot_file, "rb") as f:
+        data = bytearray(f.read())
+    live = saved_game(9)
+    live.move(0, 8)
+    before = live.get_meta()
+    for bad in (data[:-3], data[:20], data[:30] + bytes([data[30] ^ 0xFF]) + data[31:]):
+        with open(slot_file, "wb") as f:
+            f.write(bad)
+        try:
+            saves.load(0, live)
+            assert False
+        except ValueError:
+            pass
+        assert live.get_meta() == before
+        assert live.get_move_count() == 1
@@ -0,0 +1,62 @@
+import os
+import stats
+
+def fresh(tmp_path):
+    data_path = str(tmp_path)
+    stats.init(data_path)
+    return data_path
+
+def test_streak_resets_after_abandoned_game(tmp_path):
+    fresh(tmp_path)
+    stats.record(1, True, 100, 0, 300)
+    stats.record(2, True, 100, 0, 300)
+    assert stats.get_summary()[2:4] == (2, 2)
+    stats.record(3, False, 10, 0, 30)
+    assert stats.get_summary()[2:4] == (0, 2)
+    stats.record(4, True, 100, 0, 300)
+    assert stats.get_summary()[0:4] == (4, 3, 1, 2)
+
+def test_best_time_and_moves_only_from_wins(tmp_path):
+    fresh(tmp_path)
+    stats.record(1, False, 5, 0, 10)
+    assert stats.get_summary()[4:6] == (0, 0)
+    stats.record(2, True, 120, 1, 400)
+    assert stats.get_summary()[4:6] == (400, 120)
+    stats.record(3, False, 20, 0, 50)
+    assert stats.get_summary()[4:6] == (400, 120)
+    stats.record(4, True, 90, 0, 500)
+    assert stats.get_summary()[4:6] == (400, 90)
+    stats.record(5, True, 150, 0, 200)
+    assert stats.get_summary()[4:6] == (200, 90)
+
+def test_summary_rebuilt_from_log(tmp_path):
+    data_path = fresh(tmp_path)
+    for i, won in enumerate([True, False, True, True]):
+        stats.record(i, won, 100 + i, 0, 300 - i)
+    expect = stats.get_summary()
+    summary_file = os.path.join(data_path, stats.SUMMARY_NAME)
+    assert os.path.getsize(summary_file) == stats.SUMMARY_SIZE
+    os.remove(summary_file)
+    stats.init(data_path)
+    assert stats.get_summary() == expect
+    with open(summary_file, "wb") as f:
+        f.write(b"\x00" * (stats.SUMMARY_SIZE - 1))
+    stats.init(data_path)
+    assert stats.get_summary() == expect
+
+def test_truncated_last_record_is_ignored(tmp_path):
+    data_path = fresh(tmp_path)
+    stats.record(1, True, 100, 0, 300)
+    stats.record(2, False, 10, 0, 30)
+    log_file = os.path.join(data_path, stats.LOG_NAME)
+    assert os.path.getsize(log_file) == 2 * stats.RECORD_SIZE
+    with open(log_file, "ab") as f:
+        f.write(stats.make_record(3, True, 50, 0, 100)[0 : stats.RECORD_SIZE - 4])
+    os.remove(os.path.join(data_path, stats.SUMMARY_NAME))
+    stats.init(data_path)
+    assert stats.get_summary() == (2, 1, 0, 1, 300, 100)
+
+def test_record_round_trip():
+    record = stats.make_record(0xDEADBEEF, True, 70000, 3, 1234)
+    assert len(record) == stats.RECORD_SIZE
+    assert stats.split_record(record) == (0xDEADBEEF, True, 0xFFFF, 3, 1234)
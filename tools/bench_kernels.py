@@ -0,0 +1,116 @@
+""" check the viper kernels against the python ones and time both
+
+    on the device, copy this file to /apps/freecell/lib and in the REPL:
+        import sys; sys.path.append("/apps/freecell/lib")
+        import bench_kernels; bench_kernels.main()
+    on the host only the python kernels exist:
+        python tools/bench_kernels.py
+"""
+try:
+    from utime import ticks_us, ticks_diff
+except ImportError:
+    import os, sys
+    from time import perf_counter
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "apps", "freecell", "lib"))
+    def ticks_us():
+        return int(perf_counter() * 1000000)
+    def ticks_diff(a, b):
+        return a - b
+import kernels
+from freecell import FreeCell, random_int
+
+ROUNDS = 200
+
+def make_cases(games=8):
+    # (table, col ranges, rotate args, screens) from real deals
+    seed = 1
+    fc = FreeCell()
+    cases = []
+    for _ in range(games):
+        seed = random_int(seed)
+        fc.init(seed)
+        table = bytearray()
+        for col in range(8):
+            table.extend(fc.get_col_cards(col))
+        cols = [ fc.get_col_info(col)[0:2] for col in range(8) ]
+        rotates = []
+        for _ in range(8):
+            seed = random_int(seed)
+            start = seed % 52
+            seed = random_int(seed)
+            end = start + seed % (53 - start)
+            seed = random_int(seed)
+            mid = start + seed % (end - start + 1)
+            rotates.append((start, mid, end))
+        last = bytearray(16 * 8)
+        for i in range(len(last)):
+            seed = random_int(seed)
+            last[i] = seed % 24
+        current = bytearray(last)
+        for _ in range(6):
+            seed = random_int(seed)
+            current[seed % len(current)] = (current[seed % len(current)] + 1) % 24
+        cases.append((table, cols, rotates, last, current))
+    return cases
+
+def run_rotate(fn, cases):
+    out = []
+    for table, cols, rotates, last, current in cases:
+        buf = bytearray(table)
+        for start, mid, end in rotates:
+            fn(buf, start, mid, end)
+        out.append(bytes(buf))
+    return out
+
+def run_tail_run(fn, cases):
+    out = []
+    for table, cols, rotates, last, current in cases:
+        for start, end in cols:
+            out.append(fn(table, start, end))
+    return out
+
+def run_draw_col(fn, cases):
+    out = []
+    for table, cols, rotates, last, current in cases:
+        buf = bytearray(800)
+        for col in range(8):
+            start, end = cols[col]
+            fn(buf, 64 + col * 2, memoryview(table)[start : end], 20)
+        out.append(bytes(buf))
+    return out
+
+def run_next_diff(fn, cases):
+    out = []
+    for table, cols, rotates, last, current in cases:
+        size = len(last)
+        i = fn(last, current, 0, size)
+        while i < size:
+            out.append(i)
+            i = fn(last, current, i + 1, size)
+    return out
+
+def timeit(run, fn, cases):
+    t = ticks_us()
+    for _ in range(ROUNDS):
+        run(fn, cases)
+    return ticks_diff(ticks_us(), t) / ROUNDS
+
+def main():
+    cases = make_cases()
+    ok = True
+    for name, run in (("rotate", run_rotate), ("tail_run", run_tail_run), ("draw_col", run_draw_col), ("next_diff", run_next_diff)):
+        py_fn = getattr(kernels, "py_" + name)
+        viper_fn = getattr(kernels, "viper_" + name, None)
+        py_us = timeit(run, py_fn, cases)
+        if viper_fn == None:
+            print("{}: python {:.1f}us, no viper".format(name, py_us))
+            continue
+        same = run(py_fn, cases) == run(viper_fn, cases)
+        ok = ok and same
+        viper_us = timeit(run, viper_fn, cases)
+        print("{}: python {:.1f}us, viper {:.1f}us, x{:.1f}, {}".format(
+            name, py_us, viper_us, py_us / max(viper_us, 0.001), "same" if same else "MISMATCH"))
+    return ok
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+""" verify FreeCell save files pulled from devices and export their moves
+
+    python tools/verify_saves.py [-j JOBS] PATH...
+
+    every save is replayed from its seed by the game rules, one line per file:
+    path, OK or the error, seed, moves in standard notation
+    (1-8: cols, a-d: free cells, h: foundation)
+"""
+import os, sys
+from multiprocessing import Pool
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "apps", "freecell", "lib"))
+from freecell import FreeCell, parse_save
+
+PLACES = b"12345678abcdhhhh"
+NOTATION = [ bytes([PLACES[frm], PLACES[to], 0x20]) for frm in range(16) for to in range(16) ] # [frm * 16 + to]
+
+_fc = None # pooled game of this worker
+_out = None # pooled notation buffer of this worker, 3 bytes a move
+
+def _init_worker():
+    global _fc, _out
+    _fc = FreeCell()
+    _out = bytearray(3 * 0xFFFF)
+
+def verify(file_path):
+    try:
+        with open(file_path, "rb") as f:
+            seed, state, records = parse_save(f.read())
+    except (OSError, ValueError) as e:
+        return file_path, str(e), None, ""
+    count = len(records) // 2
+    good = _fc.replay(seed, records)
+    if good != count:
+        result = "illegal move {}".format(good + 1)
+    elif not _fc.same_state(state):
+        result = "state mismatch"
+    else:
+        result = "OK"
+    for i in range(good):
+        _out[i * 3 : i * 3 + 3] = NOTATION[((records[i * 2] & 0b1111) << 4) | (records[i * 2 + 1] & 0b1111)]
+    moves = _out[0 : max(good * 3 - 1, 0)].decode()
+    return file_path, result, seed, moves
+
+def iter_files(paths):
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _dirs, files in os.walk(p):
+                for name in sorted(files):
+                    if name.endswith(".sav"):
+                        yield os.path.join(root, name)
+        else:
+            yield p
+
+def main(argv):
+    jobs = os.cpu_count() or 1
+    if len(argv) >= 2 and argv[0] == "-j":
+        jobs = int(argv[1])
+        argv = argv[2:]
+    if not argv:
+        print(__doc__)
+        return 2
+    failed = 0
+    with Pool(jobs, initializer=_init_worker) as pool:
+        for file_path, result, seed, moves in pool.imap(verify, iter_files(argv), chunksize=64):
+            if result != "OK":
+                failed += 1
+            sys.stdout.write("{}\t{}\t{}\t{}\n".format(file_path, result, "" if seed == None else seed, moves))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))